@@ -1,31 +1,44 @@
-"""Authentication endpoints for magic links, OTP, and optional Google callback."""
+"""Authentication endpoints for magic links, OTP, and optional Google callback.
+
+Token, OTP, session, and rate-limit state is held in process memory, so the API
+must run as a single worker until it moves to a shared store.
+"""
 # ruff: noqa: UP017, UP006, UP007, UP035
 
 from __future__ import annotations
 
+import heapq
 import logging
 import secrets
 import smtplib
-import string
+import threading
 import time
+from bisect import bisect_right
 from dataclasses import dataclass
 from datetime import (  # noqa: UP017 - timezone.utc for py3.9 compatibility
     datetime,
-    timedelta,
     timezone,
 )
 from email.message import EmailMessage
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Annotated, Any, Iterable, Iterator, Optional
 from urllib.parse import urlencode, urlparse
 
 import httpx
-from fastapi import APIRouter, BackgroundTasks, Header, HTTPException
-from pydantic import BaseModel, EmailStr
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Response
+from pydantic import AfterValidator, BaseModel, EmailStr
 
 from app.config import settings
 from app.observability.metrics import metrics
 
+try:  # pragma: no cover - optional dependency (httpx[http2])
+    import h2  # noqa: F401
+
+    _HTTP2_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency guard
+    _HTTP2_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
@@ -35,70 +48,127 @@ OTP_TTL_SECONDS = 600
 GOOGLE_STATE_TTL_SECONDS = 600
 RATE_LIMIT_KEY_MAGIC = "magic"
 RATE_LIMIT_KEY_OTP = "otp"
+_CANONICAL_PLANS = frozenset({"solo", "growth", "team"})
+# Unlock metrics bucket lead counts by these lower bounds: 0 | 1-24 | 25-49 | 50+
+_LEAD_COUNT_BUCKET_EDGES = (1, 25, 50)
+_LEAD_COUNT_BUCKET_LABELS = ("0", "1-24", "25-49", "50+")
 GOOGLE_AUTH_URL = "https://accounts.google.com/o/oauth2/v2/auth"
 GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"  # noqa: S105 - provider URL, not a credential
 GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v2/userinfo"
 
 
-@dataclass
+@dataclass(slots=True)
 class _TokenRecord:
     email: str
-    expires_at: datetime
-    used: bool
+    expires_at: float
     token_type: str
     plan_id: str | None
 
 
-@dataclass
+@dataclass(slots=True)
 class _GoogleState:
     plan_id: str | None
-    expires_at: datetime
+    expires_at: float
 
 
 _tokens: dict[str, _TokenRecord] = {}
-_otp_codes: dict[str, _TokenRecord] = {}
+# OTPs are keyed by (email, otp) so a code issued to another address is a plain miss.
+_otp_codes: dict[tuple[str, str], _TokenRecord] = {}
 _google_states: dict[str, _GoogleState] = {}
 
 SESSION_TTL_SECONDS = 3600
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionContext:
     token: str
     email: str
-    expires_at: datetime
+    expires_at: float
     plan_id: str | None
 
 
 _sessions: dict[str, SessionContext] = {}
 _opt_out_emails: set[str] = set()
-_unlock_sent: set[str] = set()
+# Insertion-ordered dict used as a bounded LRU set of emails already sent an unlock report.
+_unlock_sent: dict[str, None] = {}
+# _mark_unlock_sent runs on BackgroundTasks worker threads; serialize its evictions.
+_unlock_sent_lock = threading.Lock()
+
+# Expiring stores share one min-heap of (expires_at, store_id, key) so sweeps
+# only touch entries that are actually due.
+_STORE_TOKENS = 0
+_STORE_OTP_CODES = 1
+_STORE_GOOGLE_STATES = 2
+_STORE_SESSIONS = 3
+_EXPIRING_STORES: tuple[dict[Any, Any], ...] = (_tokens, _otp_codes, _google_states, _sessions)
+_EXPIRING_STORE_NAMES = ("tokens", "otp_codes", "google_states", "sessions")
+_expiry_heap: list[tuple[float, int, Any]] = []
+
+
+@dataclass(slots=True)
+class _Bucket:
+    """Mutable token-bucket state; slots keep it to two floats per key."""
+
+    tokens: float
+    last_refill: float
 
 
 class RateLimiter:
-    """In-memory rate limiter keyed by (identity, token_type)."""
+    """In-memory token-bucket rate limiter keyed by (identity, token_type).
+
+    Each key holds a ``_Bucket`` that refills at ``max_requests / window_seconds``
+    tokens per second, so per-key memory is constant regardless of traffic.
+
+    ``check`` never awaits, so on the event loop each call runs to completion
+    before another handler can observe or update the bucket; no lock is needed.
+
+    Buckets are re-inserted on every hit so the dict stays in recency order. A
+    bucket idle for a full window has refilled to capacity and is equivalent to
+    a fresh one, so new keys first drop idle buckets from the front of the map.
+    """
 
     def __init__(self, max_requests: int, window_seconds: int) -> None:
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self._requests: dict[tuple[str, str], list[float]] = {}
+        self._buckets: dict[tuple[str, str], _Bucket] = {}
 
     def check(self, key: tuple[str, str]) -> float | None:
         """Record a hit; return retry_after seconds if rate-limited."""
+        # degenerate configs: no allowance denies every hit, no window limits nothing
+        if self.max_requests <= 0:
+            return float(max(self.window_seconds, 0))
+        if self.window_seconds <= 0:
+            return None
         now = time.monotonic()
-        window_start = now - self.window_seconds
-        bucket = self._requests.setdefault(key, [])
-        # drop expired hits
-        while bucket and bucket[0] < window_start:
-            bucket.pop(0)
-        if len(bucket) >= self.max_requests:
-            retry_after = bucket[0] + self.window_seconds - now
-            return max(retry_after, 0.0)
-        bucket.append(now)
+        capacity = float(self.max_requests)
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            self._prune(now)
+            # a fresh bucket is full: spend one token without the refill math
+            self._buckets[key] = _Bucket(capacity - 1.0, now)
+            return None
+        self._buckets[key] = bucket
+        rate = capacity / self.window_seconds
+        tokens = min(capacity, bucket.tokens + (now - bucket.last_refill) * rate)
+        bucket.last_refill = now
+        if tokens < 1.0:
+            bucket.tokens = tokens
+            return (1.0 - tokens) / rate
+        bucket.tokens = tokens - 1.0
         return None
 
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        idle = []
+        for key, bucket in self._buckets.items():
+            if bucket.last_refill > cutoff:
+                break
+            idle.append(key)
+        for key in idle:
+            del self._buckets[key]
+
     def reset(self) -> None:
-        self._requests.clear()
+        self._buckets.clear()
 
 
 _rate_limiter = RateLimiter(
@@ -111,17 +181,79 @@ def _now() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def _put_expiring(store_id: int, key: Any, record: Any) -> None:
+    """Insert a record into an expiring store and schedule its eviction.
+
+    Stores are capped at ``auth_max_inflight_records``. Each store uses a single
+    TTL and re-issued keys are moved to the end, so insertion order matches expiry
+    order and the first key is always the next to expire.
+    """
+    store = _EXPIRING_STORES[store_id]
+    # reassigning in place would keep the old position and break the ordering above
+    store.pop(key, None)
+    if len(store) >= settings.auth_max_inflight_records:
+        _maybe_sweep()
+        evicted = 0
+        while store and len(store) >= settings.auth_max_inflight_records:
+            del store[next(iter(store))]
+            evicted += 1
+        if evicted:
+            store_name = _EXPIRING_STORE_NAMES[store_id]
+            logger.warning(
+                "auth.store.capacity_evicted", extra={"store": store_name, "evicted": evicted}
+            )
+            metrics.increment("auth.store.evicted", value=evicted, tags={"store": store_name})
+    store[key] = record
+    heapq.heappush(_expiry_heap, (record.expires_at, store_id, key))
+    # evicted, consumed, and re-issued keys leave stale heap entries behind; rebuild
+    # from live records once they outnumber them so the heap stays bounded by the caps
+    live = sum(len(live_store) for live_store in _EXPIRING_STORES)
+    if len(_expiry_heap) > 2 * live + settings.auth_max_inflight_records:
+        _compact_expiry_heap()
+
+
+def _compact_expiry_heap() -> None:
+    """Rebuild the expiry heap from the records still present in the stores."""
+    _expiry_heap[:] = [
+        (record.expires_at, store_id, key)
+        for store_id, store in enumerate(_EXPIRING_STORES)
+        for key, record in store.items()
+    ]
+    heapq.heapify(_expiry_heap)
+
+
+def _maybe_sweep() -> None:
+    """Drop tokens, OTPs, OAuth states, and sessions whose expiry has passed."""
+    if not _expiry_heap:
+        return
+    now = time.time()
+    removed = 0
+    while _expiry_heap and _expiry_heap[0][0] < now:
+        _, store_id, key = heapq.heappop(_expiry_heap)
+        store = _EXPIRING_STORES[store_id]
+        record = store.get(key)
+        # keys may have been consumed or re-issued since they were scheduled
+        if record is not None and record.expires_at < now:
+            del store[key]
+            removed += 1
+    if removed:
+        logger.debug("auth.sweep.completed", extra={"removed": removed})
+
+
 def _generate_token() -> str:
     return secrets.token_urlsafe(32)
 
 
 def _generate_otp() -> str:
-    alphabet = string.digits
-    return "".join(secrets.choice(alphabet) for _ in range(6))
+    return f"{secrets.randbelow(1_000_000):06d}"
+
+
+# Emails are lowercased once at the API boundary so stores and lookups never re-normalize.
+NormalizedEmail = Annotated[EmailStr, AfterValidator(str.lower)]
 
 
 class MagicLinkRequest(BaseModel):
-    email: EmailStr
+    email: NormalizedEmail
     plan_id: Optional[str] = None
 
 
@@ -150,17 +282,17 @@ class SessionResponse(BaseModel):
 
 
 class OTPRequest(BaseModel):
-    email: EmailStr
+    email: NormalizedEmail
     plan_id: Optional[str] = None
 
 
 class OTPVerifyRequest(BaseModel):
-    email: EmailStr
+    email: NormalizedEmail
     otp: str
 
 
 class OptOutRequest(BaseModel):
-    email: EmailStr
+    email: NormalizedEmail
     opt_out: bool = True
     reason: str | None = None
 
@@ -170,45 +302,57 @@ class OptOutResponse(BaseModel):
     opted_out: bool
 
 
+def _json_response(model: BaseModel, status_code: int = 200) -> Response:
+    """Serialize a response model once via pydantic-core, skipping FastAPI's re-encode."""
+    return Response(
+        content=model.model_dump_json(), status_code=status_code, media_type="application/json"
+    )
+
+
 @router.post("/auth/magic-link", response_model=MagicLinkResponse, status_code=202)
-async def request_magic_link(payload: MagicLinkRequest) -> MagicLinkResponse:
+async def request_magic_link(payload: MagicLinkRequest) -> Response:
     """Issue a time-bound magic link token (email delivery handled elsewhere)."""
+    _maybe_sweep()
     plan_id = _validate_plan(payload.plan_id)
     _enforce_rate_limit(identity=payload.email, token_type=RATE_LIMIT_KEY_MAGIC)
     token = _generate_token()
-    _tokens[token] = _TokenRecord(  # noqa: S106 - token type is descriptive, not a secret
-        email=payload.email,
-        expires_at=_now() + timedelta(seconds=MAGIC_LINK_TTL_SECONDS),
-        used=False,
-        token_type="magic",  # noqa: S106 - descriptive marker
-        plan_id=plan_id,
-    )
-    logger.info(
-        "auth.magic_link.issued",
-        extra={
-            "email_domain": _mask_email(payload.email),
-            "expires_in": MAGIC_LINK_TTL_SECONDS,
-            "plan_id": plan_id,
-        },
+    _put_expiring(
+        _STORE_TOKENS,
+        token,
+        _TokenRecord(  # noqa: S106 - token type is descriptive, not a secret
+            email=payload.email,
+            expires_at=time.time() + MAGIC_LINK_TTL_SECONDS,
+            token_type="magic",  # noqa: S106 - descriptive marker
+            plan_id=plan_id,
+        ),
     )
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "auth.magic_link.issued",
+            extra={
+                "email_domain": _mask_email(payload.email),
+                "expires_in": MAGIC_LINK_TTL_SECONDS,
+                "plan_id": plan_id,
+            },
+        )
     debug_token = token if logger.isEnabledFor(logging.DEBUG) else None
-    return MagicLinkResponse(
-        message="sent", expires_in=MAGIC_LINK_TTL_SECONDS, debug_token=debug_token
+    return _json_response(
+        MagicLinkResponse(
+            message="sent", expires_in=MAGIC_LINK_TTL_SECONDS, debug_token=debug_token
+        ),
+        status_code=202,
     )
 
 
-def _resolve_token(token: str, container: dict[str, _TokenRecord], token_type: str) -> _TokenRecord:
-    record = container.get(token)
+def _resolve_token(token: Any, container: dict[Any, _TokenRecord], token_type: str) -> _TokenRecord:
+    """Consume a single-use token; replays miss and fail as invalid."""
+    record = container.pop(token, None)
+    # sweep after the lookup so an expired token still reports "Token expired"
+    _maybe_sweep()
     if not record:
         logger.warning("auth.token.invalid", extra={"token_type": token_type})
         raise HTTPException(status_code=400, detail="Invalid or expired token")
-    if record.used:
-        logger.warning(
-            "auth.token.already_used",
-            extra={"token_type": token_type, "email_domain": _mask_email(record.email)},
-        )
-        raise HTTPException(status_code=409, detail="Token already used")
-    if record.expires_at < _now():
+    if record.expires_at < time.time():
         logger.warning(
             "auth.token.expired",
             extra={"token_type": token_type, "email_domain": _mask_email(record.email)},
@@ -226,10 +370,9 @@ def _resolve_token(token: str, container: dict[str, _TokenRecord], token_type: s
 @router.post("/auth/magic-link/verify", response_model=SessionResponse)
 async def verify_magic_link(
     payload: MagicLinkVerifyRequest, background_tasks: BackgroundTasks
-) -> SessionResponse:
+) -> Response:
     """Verify a magic link token and start a trial subscription."""
     record = _resolve_token(payload.token, _tokens, "magic")
-    record.used = True
     subscription = Subscription(
         status="trialing",
         trial_started_at=_now().isoformat(),
@@ -237,61 +380,63 @@ async def verify_magic_link(
     )
     session = _issue_session(email=record.email, plan_id=record.plan_id)
     _schedule_unlock_email(session, background_tasks)
-    logger.info(
-        "auth.magic_link.verified",
-        extra={
-            "email_domain": _mask_email(record.email),
-            "subscription_status": subscription.status,
-            "plan_id": record.plan_id,
-        },
-    )
-    return SessionResponse(
-        status="verified",
-        email=record.email,
-        subscription=subscription,
-        session_token=session.token,
-        opted_out=_is_opted_out(record.email),
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "auth.magic_link.verified",
+            extra={
+                "email_domain": _mask_email(record.email),
+                "subscription_status": subscription.status,
+                "plan_id": record.plan_id,
+            },
+        )
+    return _json_response(
+        SessionResponse(
+            status="verified",
+            email=record.email,
+            subscription=subscription,
+            session_token=session.token,
+            opted_out=_is_opted_out(record.email),
+        )
     )
 
 
 @router.post("/auth/otp", response_model=MagicLinkResponse, status_code=202)
-async def request_otp(payload: OTPRequest) -> MagicLinkResponse:
+async def request_otp(payload: OTPRequest) -> Response:
     """Issue a time-bound OTP code."""
+    _maybe_sweep()
     plan_id = _validate_plan(payload.plan_id)
     _enforce_rate_limit(identity=payload.email, token_type=RATE_LIMIT_KEY_OTP)
     otp = _generate_otp()
-    _otp_codes[otp] = _TokenRecord(  # noqa: S106 - token type is descriptive, not a secret
-        email=payload.email,
-        expires_at=_now() + timedelta(seconds=OTP_TTL_SECONDS),
-        used=False,
-        token_type="otp",  # noqa: S106 - descriptive marker
-        plan_id=plan_id,
-    )
-    logger.info(
-        "auth.otp.issued",
-        extra={
-            "email_domain": _mask_email(payload.email),
-            "expires_in": OTP_TTL_SECONDS,
-            "plan_id": plan_id,
-        },
+    _put_expiring(
+        _STORE_OTP_CODES,
+        (payload.email, otp),
+        _TokenRecord(  # noqa: S106 - token type is descriptive, not a secret
+            email=payload.email,
+            expires_at=time.time() + OTP_TTL_SECONDS,
+            token_type="otp",  # noqa: S106 - descriptive marker
+            plan_id=plan_id,
+        ),
     )
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "auth.otp.issued",
+            extra={
+                "email_domain": _mask_email(payload.email),
+                "expires_in": OTP_TTL_SECONDS,
+                "plan_id": plan_id,
+            },
+        )
     debug_token = otp if logger.isEnabledFor(logging.DEBUG) else None
-    return MagicLinkResponse(message="sent", expires_in=OTP_TTL_SECONDS, debug_token=debug_token)
+    return _json_response(
+        MagicLinkResponse(message="sent", expires_in=OTP_TTL_SECONDS, debug_token=debug_token),
+        status_code=202,
+    )
 
 
 @router.post("/auth/otp/verify", response_model=SessionResponse)
-async def verify_otp(
-    payload: OTPVerifyRequest, background_tasks: BackgroundTasks
-) -> SessionResponse:
+async def verify_otp(payload: OTPVerifyRequest, background_tasks: BackgroundTasks) -> Response:
     """Verify an OTP code and start a trial subscription."""
-    record = _resolve_token(payload.otp, _otp_codes, "otp")
-    if record.email != payload.email:
-        logger.warning(
-            "auth.otp.email_mismatch",
-            extra={"email_domain": _mask_email(payload.email)},
-        )
-        raise HTTPException(status_code=400, detail="Invalid or expired token")
-    record.used = True
+    record = _resolve_token((payload.email, payload.otp), _otp_codes, "otp")
     subscription = Subscription(
         status="trialing",
         trial_started_at=_now().isoformat(),
@@ -299,20 +444,23 @@ async def verify_otp(
     )
     session = _issue_session(email=record.email, plan_id=record.plan_id)
     _schedule_unlock_email(session, background_tasks)
-    logger.info(
-        "auth.otp.verified",
-        extra={
-            "email_domain": _mask_email(record.email),
-            "subscription_status": subscription.status,
-            "plan_id": record.plan_id,
-        },
-    )
-    return SessionResponse(
-        status="verified",
-        email=record.email,
-        subscription=subscription,
-        session_token=session.token,
-        opted_out=_is_opted_out(record.email),
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "auth.otp.verified",
+            extra={
+                "email_domain": _mask_email(record.email),
+                "subscription_status": subscription.status,
+                "plan_id": record.plan_id,
+            },
+        )
+    return _json_response(
+        SessionResponse(
+            status="verified",
+            email=record.email,
+            subscription=subscription,
+            session_token=session.token,
+            opted_out=_is_opted_out(record.email),
+        )
     )
 
 
@@ -337,6 +485,31 @@ class GoogleAuthUrlResponse(BaseModel):
     state: str
 
 
+_google_http: httpx.AsyncClient | None = None
+
+
+def _get_google_client() -> httpx.AsyncClient:
+    """Return the shared Google OAuth client so keep-alive spans callbacks."""
+    global _google_http
+    if _google_http is None:
+        _google_http = httpx.AsyncClient(
+            timeout=15.0,
+            http2=_HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=10, max_keepalive_connections=5, keepalive_expiry=60
+            ),
+        )
+    return _google_http
+
+
+async def close_google_client() -> None:
+    """Close the shared Google OAuth client (called on application shutdown)."""
+    global _google_http
+    client, _google_http = _google_http, None
+    if client is not None:
+        await client.aclose()
+
+
 @router.post("/auth/google/callback", response_model=GoogleCallbackResponse)
 async def google_callback(
     _: GoogleCallbackRequest, background_tasks: BackgroundTasks
@@ -366,31 +539,32 @@ async def google_callback(
         "redirect_uri": settings.google_redirect_uri,
         "grant_type": "authorization_code",
     }
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        try:
-            token_resp = await client.post(GOOGLE_TOKEN_URL, data=token_payload)
-            token_resp.raise_for_status()
-        except httpx.HTTPError as exc:
-            logger.warning("auth.google.token_exchange_failed", extra={"error": str(exc)})
-            raise HTTPException(status_code=400, detail="Google token exchange failed") from exc
-        tokens = token_resp.json()
-        access_token = tokens.get("access_token")
-        if not access_token:
-            logger.warning("auth.google.missing_access_token")
-            raise HTTPException(status_code=400, detail="Google token exchange failed")
-        try:
-            userinfo_resp = await client.get(
-                GOOGLE_USERINFO_URL, headers={"Authorization": f"Bearer {access_token}"}
-            )
-            userinfo_resp.raise_for_status()
-        except httpx.HTTPError as exc:
-            logger.warning("auth.google.userinfo_failed", extra={"error": str(exc)})
-            raise HTTPException(status_code=400, detail="Google userinfo fetch failed") from exc
-        userinfo = userinfo_resp.json()
+    client = _get_google_client()
+    try:
+        token_resp = await client.post(GOOGLE_TOKEN_URL, data=token_payload)
+        token_resp.raise_for_status()
+    except httpx.HTTPError as exc:
+        logger.warning("auth.google.token_exchange_failed", extra={"error": str(exc)})
+        raise HTTPException(status_code=400, detail="Google token exchange failed") from exc
+    tokens = token_resp.json()
+    access_token = tokens.get("access_token")
+    if not access_token:
+        logger.warning("auth.google.missing_access_token")
+        raise HTTPException(status_code=400, detail="Google token exchange failed")
+    try:
+        userinfo_resp = await client.get(
+            GOOGLE_USERINFO_URL, headers={"Authorization": f"Bearer {access_token}"}
+        )
+        userinfo_resp.raise_for_status()
+    except httpx.HTTPError as exc:
+        logger.warning("auth.google.userinfo_failed", extra={"error": str(exc)})
+        raise HTTPException(status_code=400, detail="Google userinfo fetch failed") from exc
+    userinfo = userinfo_resp.json()
     email = userinfo.get("email")
     if not email:
         logger.warning("auth.google.email_missing")
         raise HTTPException(status_code=400, detail="Google account missing email")
+    email = email.lower()
 
     subscription = Subscription(
         status="trialing",
@@ -399,13 +573,14 @@ async def google_callback(
     )
     session = _issue_session(email=email, plan_id=state.plan_id)
     _schedule_unlock_email(session, background_tasks)
-    logger.info(
-        "auth.google.callback.success",
-        extra={
-            "email_domain": _mask_email(email),
-            "plan_id": state.plan_id,
-        },
-    )
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "auth.google.callback.success",
+            extra={
+                "email_domain": _mask_email(email),
+                "plan_id": state.plan_id,
+            },
+        )
     return GoogleCallbackResponse(
         status="verified",
         message="Google OAuth verified",
@@ -420,27 +595,28 @@ async def google_callback(
 def _validate_plan(plan_id: str | None) -> str | None:
     if plan_id is None:
         return None
-    allowed = settings.auth_allowed_plans | {"solo", "growth", "team"}
     plan = plan_id.strip()
     plan_normalized = plan.lower()
     # Map legacy "starter" to "solo" for backward compatibility
     if plan_normalized == "starter":
         plan_normalized = "solo"
-    if plan_normalized in {"solo", "growth", "team"}:
-        plan = plan_normalized
-    if plan not in allowed:
+    if plan_normalized in _CANONICAL_PLANS:
+        return plan_normalized
+    # Only configured Stripe price ids reach the settings lookup.
+    if plan not in settings.auth_allowed_plans:
         logger.warning("auth.plan.invalid", extra={"plan_id": plan})
         raise HTTPException(status_code=400, detail="Invalid plan")
     return plan
 
 
+@lru_cache(maxsize=4096)
 def _mask_email(email: str) -> str:
-    domain = email.split("@")[-1] if "@" in email else ""
-    return f"*@{domain}" if domain else "*"
+    _, sep, domain = email.rpartition("@")
+    return f"*@{domain}" if sep and domain else "*"
 
 
 def _enforce_rate_limit(*, identity: str, token_type: str) -> None:
-    retry_after = _rate_limiter.check((identity.lower(), token_type))
+    retry_after = _rate_limiter.check((identity, token_type))
     if retry_after is not None:
         logger.warning(
             "auth.rate_limited",
@@ -459,9 +635,13 @@ def _enforce_rate_limit(*, identity: str, token_type: str) -> None:
 
 def _issue_google_state(plan_id: str | None) -> str:
     state = secrets.token_urlsafe(32)
-    _google_states[state] = _GoogleState(
-        plan_id=plan_id,
-        expires_at=_now() + timedelta(seconds=GOOGLE_STATE_TTL_SECONDS),
+    _put_expiring(
+        _STORE_GOOGLE_STATES,
+        state,
+        _GoogleState(
+            plan_id=plan_id,
+            expires_at=time.time() + GOOGLE_STATE_TTL_SECONDS,
+        ),
     )
     return state
 
@@ -470,11 +650,12 @@ def _resolve_google_state(state: str | None) -> _GoogleState:
     if not state:
         logger.warning("auth.google.state.missing")
         raise HTTPException(status_code=400, detail="Invalid state")
+    _maybe_sweep()
     record = _google_states.pop(state, None)
     if not record:
         logger.warning("auth.google.state.unknown")
         raise HTTPException(status_code=400, detail="Invalid state")
-    if record.expires_at < _now():
+    if record.expires_at < time.time():
         logger.warning("auth.google.state.expired")
         raise HTTPException(status_code=400, detail="State expired")
     return record
@@ -486,22 +667,23 @@ def _issue_session(*, email: str, plan_id: str | None) -> SessionContext:
         token=token,
         email=email,
         plan_id=plan_id,
-        expires_at=_now() + timedelta(seconds=SESSION_TTL_SECONDS),
-    )
-    _sessions[token] = ctx
-    logger.info(
-        "auth.session.issued",
-        extra={
-            "email_domain": _mask_email(email),
-            "plan_id": plan_id,
-            "expires_in": SESSION_TTL_SECONDS,
-        },
+        expires_at=time.time() + SESSION_TTL_SECONDS,
     )
+    _put_expiring(_STORE_SESSIONS, token, ctx)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "auth.session.issued",
+            extra={
+                "email_domain": _mask_email(email),
+                "plan_id": plan_id,
+                "expires_in": SESSION_TTL_SECONDS,
+            },
+        )
     return ctx
 
 
 def _is_opted_out(email: str) -> bool:
-    return email.lower() in _opt_out_emails
+    return email in _opt_out_emails
 
 
 def _resolve_session(token: str) -> SessionContext:
@@ -509,7 +691,7 @@ def _resolve_session(token: str) -> SessionContext:
     if not ctx:
         logger.warning("auth.session.invalid")
         raise HTTPException(status_code=401, detail="Invalid session")
-    if ctx.expires_at < _now():
+    if ctx.expires_at < time.time():
         logger.warning("auth.session.expired", extra={"email_domain": _mask_email(ctx.email)})
         raise HTTPException(status_code=401, detail="Session expired")
     return ctx
@@ -525,34 +707,73 @@ def require_session(authorization: str | None = Header(default=None)) -> Session
 
 def _schedule_unlock_email(session: SessionContext, background_tasks: BackgroundTasks) -> None:
     """Dispatch the unlock email after verification without blocking the request."""
-    email_key = session.email.lower()
-    if _is_opted_out(email_key):
-        logger.info(
-            "delivery.unlock.skipped_opt_out", extra={"email_domain": _mask_email(session.email)}
-        )
+    if _is_opted_out(session.email):
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "delivery.unlock.skipped_opt_out",
+                extra={"email_domain": _mask_email(session.email)},
+            )
         metrics.increment("delivery.unlock.skipped", tags={"reason": "opt_out"})
         return
-    if email_key in _unlock_sent:
-        logger.info(
-            "delivery.unlock.already_sent", extra={"email_domain": _mask_email(session.email)}
-        )
+    if session.email in _unlock_sent:
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "delivery.unlock.already_sent", extra={"email_domain": _mask_email(session.email)}
+            )
         metrics.increment("delivery.unlock.skipped", tags={"reason": "duplicate"})
         return
     metrics.increment("delivery.unlock.queued")
     background_tasks.add_task(_dispatch_unlock_email, session)
 
 
+def _render_unlock_lines(
+    email: str, generated_at: str, leads: Iterable[dict[str, Any]]
+) -> Iterator[str]:
+    """Yield the unlock report Markdown line by line."""
+    yield f"# FundSignal Full Report — {email}"
+    yield ""
+    yield f"_Generated at {generated_at}_"
+    yield ""
+    yield "Upgrade now to keep weekly deliveries coming."
+    yield ""
+    for idx, lead in enumerate(leads, start=1):
+        get = lead.get
+        yield (
+            f"{idx}. {get('company_id')} — {get('score')} pts"
+            f" (freshness: {get('freshness', 'unknown')})"
+        )
+        yield f"   - Recommended: {get('recommended_approach')}"
+        yield f"   - Pitch: {get('pitch_angle')}"
+        for proof in get("proofs") or ():
+            yield f"   - Proof: {proof}"
+        yield ""
+    yield "To opt out of emails, call POST /auth/opt-out with your email."
+
+
+def _mark_unlock_sent(email: str) -> None:
+    """Record an unlock delivery, evicting the least recent once over capacity."""
+    with _unlock_sent_lock:
+        _unlock_sent.pop(email, None)
+        _unlock_sent[email] = None
+        while len(_unlock_sent) > settings.unlock_dedup_capacity:
+            del _unlock_sent[next(iter(_unlock_sent))]
+
+
+def _lead_count_bucket(lead_count: int) -> str:
+    return _LEAD_COUNT_BUCKET_LABELS[bisect_right(_LEAD_COUNT_BUCKET_EDGES, lead_count)]
+
+
 def _dispatch_unlock_email(session: SessionContext) -> None:
     """Render and persist a full report email artifact."""
-    email_key = session.email.lower()
-    logger.info(
-        "delivery.unlock.dispatch_start", extra={"email_domain": _mask_email(session.email)}
-    )
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "delivery.unlock.dispatch_start", extra={"email_domain": _mask_email(session.email)}
+        )
     metrics.increment("delivery.unlock.dispatch_start")
     try:
         from app.api.routes import delivery as delivery_routes
 
-        leads = delivery_routes._load_fixture()
+        leads = delivery_routes._load_cached_fixture()
     except Exception:  # pragma: no cover - defensive
         logger.exception("delivery.unlock.failed_to_load_leads")
         metrics.alert(
@@ -565,62 +786,126 @@ def _dispatch_unlock_email(session: SessionContext) -> None:
         return
     output_dir = Path(settings.delivery_output_dir or "output")
     output_dir.mkdir(parents=True, exist_ok=True)
-    generated_at = _now().isoformat()
-    body_lines = [
-        f"# FundSignal Full Report — {session.email}",
-        "",
-        f"_Generated at {generated_at}_",
-        "",
-        "Upgrade now to keep weekly deliveries coming.",
-        "",
-    ]
-    for idx, lead in enumerate(leads[:50], start=1):
-        proofs = lead.get("proofs") or []
-        body_lines.append(
-            f"{idx}. {lead.get('company_id')} — {lead.get('score')} pts (freshness: {lead.get('freshness', 'unknown')})"
-        )
-        body_lines.append(f"   - Recommended: {lead.get('recommended_approach')}")
-        body_lines.append(f"   - Pitch: {lead.get('pitch_angle')}")
-        if proofs:
-            for proof in proofs:
-                body_lines.append(f"   - Proof: {proof}")
-        body_lines.append("")
-    body_lines.append("To opt out of emails, call POST /auth/opt-out with your email.")
+    body = "\n".join(_render_unlock_lines(session.email, _now().isoformat(), leads[:50]))
     artifact = output_dir / f"unlock_email_{session.token}.md"
-    artifact.write_text("\n".join(body_lines), encoding="utf-8")
-    _unlock_sent.add(email_key)
+    artifact.write_bytes(body.encode("utf-8"))
+    _mark_unlock_sent(session.email)
     lead_count = len(leads)
     metrics.increment("delivery.unlock.artifact_written", tags={"lead_count": lead_count})
-    delivery_status = _maybe_email_unlock(session.email, body_lines)
-    logger.info(
-        "delivery.unlock.sent",
-        extra={
-            "email_domain": _mask_email(session.email),
-            "lead_count": lead_count,
-            "artifact": str(artifact),
-            "delivery_status": delivery_status,
-        },
-    )
-    if lead_count >= 50:
-        bucket = "50+"
-    elif lead_count >= 25:
-        bucket = "25-49"
-    elif lead_count > 0:
-        bucket = "1-24"
-    else:
-        bucket = "0"
+    delivery_status = _maybe_email_unlock(session.email, body)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "delivery.unlock.sent",
+            extra={
+                "email_domain": _mask_email(session.email),
+                "lead_count": lead_count,
+                "artifact": str(artifact),
+                "delivery_status": delivery_status,
+            },
+        )
     metrics.increment(
-        "delivery.unlock.completed", tags={"status": delivery_status, "lead_count_bucket": bucket}
+        "delivery.unlock.completed",
+        tags={"status": delivery_status, "lead_count_bucket": _lead_count_bucket(lead_count)},
     )
 
 
-def _maybe_email_unlock(recipient: str, body_lines: list[str]) -> str:
+class _SmtpPool:
+    """Process-wide persistent SMTP connection reused across unlock emails.
+
+    Holds at most one live connection for the current (host, port, ssl, user)
+    target. A reused connection is checked with NOOP first and reopened if the
+    server dropped it; any send failure closes it so the next send reconnects.
+    Unlock emails are sent from background worker threads, so access is
+    serialized with a threading lock.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._client: smtplib.SMTP | None = None
+        self._target: tuple[str, int, bool, str] | None = None
+
+    def send(
+        self,
+        msg: EmailMessage,
+        *,
+        host: str,
+        port: int,
+        use_ssl: bool,
+        user: str,
+        password: str,
+        starttls: bool,
+    ) -> None:
+        target = (host, port, use_ssl, user)
+        with self._lock:
+            client = self._client if self._target == target else None
+            if client is not None and not self._is_alive(client):
+                client = None
+            if client is None:
+                self._close_locked()
+                client = self._connect(host, port, use_ssl, user, password, starttls)
+                self._client, self._target = client, target
+            try:
+                client.send_message(msg)
+            except Exception:
+                self._close_locked()
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_locked()
+
+    @staticmethod
+    def _connect(
+        host: str, port: int, use_ssl: bool, user: str, password: str, starttls: bool
+    ) -> smtplib.SMTP:
+        client = (
+            smtplib.SMTP_SSL(host, port, timeout=15)
+            if use_ssl
+            else smtplib.SMTP(host, port, timeout=15)
+        )
+        try:
+            if starttls:
+                client.starttls()
+            if user or password:
+                client.login(user, password)
+        except Exception:
+            _quit_quietly(client)
+            raise
+        return client
+
+    @staticmethod
+    def _is_alive(client: smtplib.SMTP) -> bool:
+        try:
+            return client.noop()[0] == 250
+        except Exception:
+            _quit_quietly(client)
+            return False
+
+    def _close_locked(self) -> None:
+        if self._client is not None:
+            _quit_quietly(self._client)
+        self._client = None
+        self._target = None
+
+
+def _quit_quietly(client: smtplib.SMTP) -> None:
+    try:
+        client.quit()
+    except Exception:  # pragma: no cover - best effort
+        logger.debug("delivery.unlock.email_quit_failed", exc_info=True)
+
+
+_smtp_pool = _SmtpPool()
+
+
+def _maybe_email_unlock(recipient: str, body: str) -> str:
     """Send unlock email via SMTP if configured; skip silently if not."""
     if not settings.email_smtp_url or not settings.email_from:
         logger.info("delivery.unlock.email_skipped", extra={"reason": "smtp_not_configured"})
         metrics.increment("delivery.unlock.email_skipped", tags={"reason": "smtp_not_configured"})
         return "skipped"
-    logger.info("delivery.unlock.email_attempt", extra={"email_domain": _mask_email(recipient)})
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("delivery.unlock.email_attempt", extra={"email_domain": _mask_email(recipient)})
     parsed = urlparse(settings.email_smtp_url)
     if parsed.scheme not in {"smtp", "smtps", "smtp+ssl"}:
         logger.warning("delivery.unlock.email_invalid_scheme", extra={"scheme": parsed.scheme})
@@ -653,19 +938,18 @@ def _maybe_email_unlock(recipient: str, body_lines: list[str]) -> str:
     msg["From"] = settings.email_from
     msg["To"] = recipient
     msg["Subject"] = "Your FundSignal unlock report"
-    msg.set_content("\n".join(body_lines))
+    msg.set_content(body)
     try:
-        client = (
-            smtplib.SMTP_SSL(host, port, timeout=15)
-            if use_ssl
-            else smtplib.SMTP(host, port, timeout=15)
+        _smtp_pool.send(
+            msg,
+            host=host,
+            port=port,
+            use_ssl=use_ssl,
+            user=user,
+            password=password,
+            starttls=not use_ssl and not settings.email_disable_tls,
         )
-        try:
-            if not use_ssl and not settings.email_disable_tls:
-                client.starttls()
-            if user or password:
-                client.login(user, password)
-            client.send_message(msg)
+        if logger.isEnabledFor(logging.INFO):
             logger.info(
                 "delivery.unlock.email_sent",
                 extra={
@@ -673,20 +957,11 @@ def _maybe_email_unlock(recipient: str, body_lines: list[str]) -> str:
                     "message_id": msg["Message-ID"],
                 },
             )
-            metrics.increment(
-                "delivery.unlock.email_sent",
-                tags={"protocol": "ssl" if use_ssl else "starttls"},
-            )
-            return "sent"
-        finally:  # noqa: SIM105 - nested try/finally intentional for quit logging
-            try:
-                client.quit()
-            except Exception:  # pragma: no cover - best effort
-                logger.debug(
-                    "delivery.unlock.email_quit_failed",
-                    exc_info=True,
-                    extra={"email_domain": _mask_email(recipient)},
-                )
+        metrics.increment(
+            "delivery.unlock.email_sent",
+            tags={"protocol": "ssl" if use_ssl else "starttls"},
+        )
+        return "sent"
     except Exception:
         logger.exception(
             "delivery.unlock.email_failed",
@@ -701,7 +976,6 @@ def _maybe_email_unlock(recipient: str, body_lines: list[str]) -> str:
             tags={"reason": "smtp_error"},
         )
         return "failed"
-    return "sent"
 
 
 @router.get("/auth/google/url", response_model=GoogleAuthUrlResponse)
@@ -724,29 +998,30 @@ async def google_auth_url(plan_id: Optional[str] = None) -> GoogleAuthUrlRespons
         }
     )
     url = f"{GOOGLE_AUTH_URL}?{query}"
-    logger.info(
-        "auth.google.url.issued",
-        extra={"state": state, "plan_id": validated_plan},
-    )
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "auth.google.url.issued",
+            extra={"state": state, "plan_id": validated_plan},
+        )
     return GoogleAuthUrlResponse(url=url, state=state)
 
 
 @router.post("/auth/opt-out", response_model=OptOutResponse)
 async def opt_out(payload: OptOutRequest) -> OptOutResponse:
     """Set or clear email opt-out for unlock deliveries."""
-    email_key = payload.email.lower()
     if payload.opt_out:
-        _opt_out_emails.add(email_key)
+        _opt_out_emails.add(payload.email)
         status = "opted_out"
     else:
-        _opt_out_emails.discard(email_key)
+        _opt_out_emails.discard(payload.email)
         status = "opted_in"
-    logger.info(
-        "auth.opt_out.updated",
-        extra={
-            "email_domain": _mask_email(payload.email),
-            "opt_out": payload.opt_out,
-            "reason": payload.reason,
-        },
-    )
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "auth.opt_out.updated",
+            extra={
+                "email_domain": _mask_email(payload.email),
+                "opt_out": payload.opt_out,
+                "reason": payload.reason,
+            },
+        )
     return OptOutResponse(status=status, opted_out=payload.opt_out)
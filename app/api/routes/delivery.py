@@ -3,28 +3,36 @@
 
 from __future__ import annotations
 
+import asyncio
 import hmac
 import json
 import logging
+import re
 import secrets
+import time
+from collections.abc import Callable
 from datetime import (  # noqa: UP017 - timezone.utc for py3.9 compatibility
     datetime,
     timedelta,
     timezone,
 )
-from hashlib import blake2b, sha256
+from functools import lru_cache
+from hashlib import blake2b
+from itertools import islice
 from pathlib import Path
 from typing import Any
 from uuid import UUID
 
 import stripe
-from fastapi import APIRouter, Depends, Header, HTTPException, Request
-from pydantic import BaseModel, EmailStr, Field
-from sqlalchemy import delete
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from sqlalchemy import bindparam, delete
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
-from app.api.routes.auth import SessionContext, require_session
+from app.api.routes.auth import NormalizedEmail, SessionContext, require_session
 from app.config import settings
 from app.core.database import get_database
 from app.models.subscription import ProcessedEvent, Subscription
@@ -36,18 +44,47 @@ router = APIRouter()
 
 TRIAL_DAYS = 14
 
+# Statements are built once; per-call values are bound by name at execute time.
+_SUBSCRIPTION_BY_ID = select(Subscription).where(
+    Subscription.subscription_id == bindparam("subscription_id")
+)
+_LATEST_SUBSCRIPTION_BY_EMAIL = (
+    select(Subscription)
+    .where(Subscription.email == bindparam("email"))
+    .order_by(Subscription.updated_at.desc())
+    .limit(1)
+)
+_CUSTOMER_ID_BY_EMAIL = (
+    select(Subscription.customer_id)
+    .where(Subscription.email == bindparam("email"))
+    .order_by(Subscription.updated_at.desc())
+    .limit(1)
+)
+_EVENT_BY_ID = select(ProcessedEvent).where(ProcessedEvent.event_id == bindparam("event_id"))
+_DELETE_EVENT_BY_ID = delete(ProcessedEvent).where(ProcessedEvent.event_id == bindparam("event_id"))
+_EVENT_TABLE_PROBE = select(ProcessedEvent).limit(1)
+_event_table_ready = False
+LEADS_FIXTURE_PATH = Path("tests/fixtures/scoring/regression_companies.json")
+# Insertion-ordered dict used as a bounded LRU set of webhook event ids already applied.
+_recent_events: dict[str, None] = {}
+
 
 def _load_fixture() -> list[dict[str, Any]]:
-    payload_path = Path("tests/fixtures/scoring/regression_companies.json")
+    payload_path = LEADS_FIXTURE_PATH
     if not payload_path.exists():
         return []
-    payload = json.loads(payload_path.read_text(encoding="utf-8"))
+    payload = json.loads(payload_path.read_bytes())
     companies = payload.get("companies", [])
     leads: list[dict[str, Any]] = []
     generated_at = datetime.now(timezone.utc).isoformat()
+    # proofs and source URLs repeat across companies; keep one copy of each string
+    pool: dict[str, str] = {}
     for entry in companies:
         profile = entry.get("profile") or {}
-        proofs = profile.get("buying_signals", [])
+        proofs = tuple(pool.setdefault(proof, proof) for proof in profile.get("buying_signals", []))
+        verified_sources = tuple(
+            pool.setdefault(source, source) for source in profile.get("verified_sources", [])
+        )
         leads.append(
             {
                 "company_id": profile.get("company_id"),
@@ -55,7 +92,7 @@ def _load_fixture() -> list[dict[str, Any]]:
                 "recommended_approach": "Personalized outreach via founder",
                 "pitch_angle": "We accelerate outbound for funded SaaS teams.",
                 "proofs": proofs,
-                "verified_sources": profile.get("verified_sources", []),
+                "verified_sources": verified_sources,
                 "freshness": generated_at,
                 "report_generated_at": generated_at,
                 "proof_count": len(proofs),
@@ -65,6 +102,31 @@ def _load_fixture() -> list[dict[str, Any]]:
     return leads
 
 
+@lru_cache(maxsize=1)
+def _fixture_snapshot(mtime_ns: int) -> tuple[dict[str, Any], ...]:
+    """Parse the leads fixture once per on-disk revision (keyed by mtime).
+
+    ``freshness``/``report_generated_at`` are stamped when a revision is parsed,
+    not per request.
+    """
+    return tuple(_load_fixture())
+
+
+def _fixture_mtime_ns() -> int | None:
+    try:
+        return LEADS_FIXTURE_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _load_cached_fixture() -> tuple[dict[str, Any], ...]:
+    """Return parsed leads, re-reading the fixture only when its mtime changes."""
+    mtime_ns = _fixture_mtime_ns()
+    if mtime_ns is None:
+        return ()
+    return _fixture_snapshot(mtime_ns)
+
+
 class LeadResponse(BaseModel):
     company_id: UUID
     score: int
@@ -78,11 +140,44 @@ class LeadResponse(BaseModel):
     upgrade_cta: str
 
 
+@lru_cache(maxsize=1)
+def _lead_models_snapshot(mtime_ns: int) -> tuple[LeadResponse, ...]:
+    """Validate the fixture leads once per on-disk revision."""
+    return tuple(LeadResponse(**lead) for lead in _fixture_snapshot(mtime_ns))
+
+
+def warm_leads_cache() -> None:
+    """Parse and validate the current fixture revision ahead of the first /leads hit.
+
+    Called once from the app lifespan; later revisions are still picked up lazily.
+    A bad fixture must not block startup, so failures are logged and /leads loads
+    (and reports) it on first use as before.
+    """
+    try:
+        mtime_ns = _fixture_mtime_ns()
+        if mtime_ns is not None:
+            _lead_models_snapshot(mtime_ns)
+    except Exception as exc:
+        logger.warning("leads.warm.failed", extra={"error": str(exc)})
+
+
+_LEAD_LIST_ADAPTER = TypeAdapter(list[LeadResponse])
+
+
+@lru_cache(maxsize=256)
+def _leads_page_json(mtime_ns: int | None, score_gte: int, limit: int) -> tuple[bytes, int]:
+    """Serialize one /leads page per fixture revision and query; returns (body, count)."""
+    models = _lead_models_snapshot(mtime_ns) if mtime_ns is not None else ()
+    # stop scanning once the page is full
+    page = list(islice((lead for lead in models if lead.score >= score_gte), limit))
+    return _LEAD_LIST_ADAPTER.dump_json(page), len(page)
+
+
 class SubscribeRequest(BaseModel):
     price_id: str | None = None
     plan_id: str | None = None
     payment_method_id: str | None = None
-    customer_email: EmailStr
+    customer_email: NormalizedEmail
 
     def resolved_plan(self) -> str:
         plan = self.plan_id or self.price_id
@@ -105,7 +200,7 @@ class SubscribeResponse(BaseModel):
 
 class CancelRequest(BaseModel):
     subscription_id: str | None = None
-    email: EmailStr | None = None
+    email: NormalizedEmail | None = None
     reason: str | None = None
 
 
@@ -144,22 +239,21 @@ async def list_leads(
     score_gte: int = 0,
     limit: int = 25,
     session: SessionContext = Depends(require_session),
-) -> list[LeadResponse]:
+) -> Response:
     """Return leads from the regression fixture; filters by minimum score."""
-    leads = _load_fixture()
-    filtered = [lead for lead in leads if int(lead.get("score", 0)) >= score_gte]
     bounded_limit = min(max(limit, 1), 50)
-    sliced = filtered[:bounded_limit]
+    body, count = _leads_page_json(_fixture_mtime_ns(), score_gte, bounded_limit)
     logger.info(
         "leads.list",
         extra={
-            "count": len(sliced),
+            "count": count,
             "score_gte": score_gte,
             "limit": bounded_limit,
-            "email_domain": session.email.split("@")[-1] if "@" in session.email else "*",
+            "email_domain": _mask_email(session.email),
         },
     )
-    return [LeadResponse(**lead) for lead in sliced]
+    # prebuilt body: skips FastAPI's per-request re-validation and encoding
+    return Response(content=body, media_type="application/json")
 
 
 def _trial_window() -> tuple[str, str]:
@@ -168,11 +262,17 @@ def _trial_window() -> tuple[str, str]:
     return trial_start_dt.isoformat(), trial_end_dt.isoformat()
 
 
+@lru_cache(maxsize=4096)
+def _from_epoch(ts: int) -> datetime:
+    """Return the UTC datetime for a Stripe epoch timestamp (memoized; retries repeat them)."""
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
 def _mask_email(email: str | None) -> str:
     if not email:
         return "*"
-    domain = email.split("@")[-1] if "@" in email else ""
-    return f"*@{domain}" if domain else "*"
+    _, sep, domain = email.rpartition("@")
+    return f"*@{domain}" if sep and domain else "*"
 
 
 def _extract_client_secret(subscription: dict[str, Any]) -> str | None:
@@ -212,13 +312,20 @@ def _resolve_plan_label(plan_id: str) -> str:
     return label_map.get(plan_id, plan_id)
 
 
-async def _persist_subscription_record(db: AsyncSession | None, record: dict[str, Any]) -> None:
-    """Persist subscription to DB; DB is required."""
+async def _persist_subscription_record(
+    db: AsyncSession | None, record: dict[str, Any], *, commit: bool = True
+) -> Subscription | None:
+    """Persist subscription to DB; DB is required.
+
+    With ``commit=False`` the change is left pending so the caller can commit it
+    together with related rows in one transaction.
+    """
     if db is None:
         raise HTTPException(status_code=503, detail="Database not configured")
-    stmt = select(Subscription).where(Subscription.subscription_id == record["subscription_id"])
-    result = await db.execute(stmt)
-    existing = result.scalar_one_or_none()
+    # Stripe echoes emails as customers typed them; store them the way auth looks them up
+    email = record.get("email")
+    email = email.lower() if email else None
+    existing = await db.scalar(_SUBSCRIPTION_BY_ID, {"subscription_id": record["subscription_id"]})
     if existing:
         existing.status = record.get("status", existing.status)
         existing.trial_start = _coerce_dt(record.get("trial_start"), existing.trial_start)
@@ -231,12 +338,13 @@ async def _persist_subscription_record(db: AsyncSession | None, record: dict[str
             record.get("payment_method_id") or existing.default_payment_method
         )
         existing.price_id = record.get("plan_id") or existing.price_id
-        existing.email = record.get("email") or existing.email
+        existing.email = email or existing.email
         existing.customer_id = record.get("customer_id") or existing.customer_id
+        subscription = existing
     else:
         required_fields = {
             "customer_id": record.get("customer_id"),
-            "email": record.get("email"),
+            "email": email,
             "plan_id": record.get("plan_id"),
             "status": record.get("status"),
         }
@@ -249,11 +357,11 @@ async def _persist_subscription_record(db: AsyncSession | None, record: dict[str
                     "missing_fields": ",".join(missing),
                 },
             )
-            return
-        db_obj = Subscription(
+            return None
+        subscription = Subscription(
             subscription_id=record["subscription_id"],
             customer_id=record["customer_id"],
-            email=record["email"],
+            email=email,
             price_id=record["plan_id"],
             status=record["status"],
             trial_start=_coerce_dt(record.get("trial_start")),
@@ -262,7 +370,13 @@ async def _persist_subscription_record(db: AsyncSession | None, record: dict[str
             cancel_at_period_end=record.get("cancel_at_period_end", False),
             default_payment_method=record.get("payment_method_id"),
         )
-        db.add(db_obj)
+        db.add(subscription)
+    if commit:
+        await _commit_subscription(db)
+    return subscription
+
+
+async def _commit_subscription(db: AsyncSession) -> None:
     try:
         await db.commit()
     except Exception:
@@ -271,41 +385,119 @@ async def _persist_subscription_record(db: AsyncSession | None, record: dict[str
         raise HTTPException(status_code=500, detail="Failed to persist subscription")
 
 
-async def _mark_event(db: AsyncSession, event_id: str, sub_id: str | None = None) -> None:
+async def _mark_event(
+    db: AsyncSession,
+    event_id: str,
+    sub_id: str | None = None,
+    subscription: Subscription | None = None,
+) -> bool:
+    """Record a processed webhook event and commit it with the pending subscription change.
+
+    The caller has already ruled out a duplicate for ``event_id`` in this session;
+    returns True when a concurrent delivery of the same event committed first.
+    """
     if not sub_id:
-        return
-    stmt = select(ProcessedEvent).where(ProcessedEvent.event_id == event_id)
-    result = await db.execute(stmt)
-    if result.scalar_one_or_none():
-        return
-    db.add(ProcessedEvent(event_id=event_id, subscription_id=sub_id))
-    stmt = select(Subscription).where(Subscription.subscription_id == sub_id)
-    sub_result = await db.execute(stmt)
-    subscription = sub_result.scalar_one_or_none()
-    if not subscription:
+        return False
+    if subscription is None:
         logger.warning(
             "stripe.webhook.event_missing_subscription",
             extra={"event_id": event_id, "subscription_id": sub_id},
         )
-        return
+        return False
+    db.add(ProcessedEvent(event_id=event_id, subscription_id=sub_id))
     subscription.last_event_id = event_id
     try:
         await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        # lost the race on the processed_events primary key: the other delivery applied it
+        if await db.get(ProcessedEvent, event_id) is None:
+            logger.exception("stripe.subscription.persist_failed")
+            raise HTTPException(status_code=500, detail="Failed to persist subscription")
+        logger.info("stripe.webhook.duplicate_race", extra={"event_id": event_id})
+        _remember_event(event_id)
+        return True
     except Exception:
         await db.rollback()
+        logger.exception("stripe.subscription.persist_failed")
+        raise HTTPException(status_code=500, detail="Failed to persist subscription")
+    _remember_event(event_id)
+    return False
+
+
+def _remember_event(event_id: str) -> None:
+    """Record an applied webhook event, evicting the least recent once over capacity."""
+    _recent_events.pop(event_id, None)
+    _recent_events[event_id] = None
+    while len(_recent_events) > settings.stripe_event_dedup_capacity:
+        del _recent_events[next(iter(_recent_events))]
 
 
 async def _ensure_event_tables(db: AsyncSession) -> None:
-    """Ensure processed_events table exists in DB session (for lightweight fakes)."""
+    """Ensure processed_events table exists in DB session (for lightweight fakes).
+
+    The table does not disappear at runtime, so one successful probe per process
+    is enough; later calls return without a round-trip.
+    """
+    global _event_table_ready
+    if _event_table_ready:
+        return
     try:
-        await db.execute(select(ProcessedEvent).limit(1))
+        await db.execute(_EVENT_TABLE_PROBE)
     except Exception:
         # no-op for real DBs; fakes should handle missing table gracefully
         return
+    _event_table_ready = True
+
+
+async def _known_customer_id(db: AsyncSession, email: str) -> str | None:
+    """Return a Stripe customer id already stored for this email, if any."""
+    return await db.scalar(_CUSTOMER_ID_BY_EMAIL, {"email": email})
+
+
+async def _attach_payment_method(
+    email: str, payment_method_id: str, known_customer_id: str | None
+) -> tuple[str, dict[str, Any]]:
+    """Attach the payment method to the stored customer, or to a looked-up/new one.
+
+    A stored customer id can go stale (customer deleted in Stripe); fall back to
+    resolving the customer by email rather than failing every later subscribe.
+    """
+    if known_customer_id:
+        try:
+            attached = await asyncio.to_thread(
+                stripe.PaymentMethod.attach, payment_method_id, customer=known_customer_id
+            )
+            return known_customer_id, attached
+        except stripe.error.InvalidRequestError as exc:  # type: ignore[attr-defined]
+            # only a missing customer means the stored id is stale; a bad, declined, or
+            # already-attached payment method must surface as-is
+            if exc.code != "resource_missing" or exc.param != "customer":
+                raise
+            logger.warning("stripe.subscribe.stale_customer", extra={"error": str(exc)})
+    customer = await asyncio.to_thread(_find_or_create_customer, email=email)
+    attached = await asyncio.to_thread(
+        stripe.PaymentMethod.attach, payment_method_id, customer=customer["id"]
+    )
+    return customer["id"], attached
+
+
+def configure_stripe() -> None:
+    """Point the Stripe SDK at the configured secret key and HTTP timeout.
+
+    Called once from the app lifespan; call again after changing
+    ``settings.stripe_secret_key`` at runtime.
+    """
+    if settings.stripe_secret_key:
+        stripe.api_key = settings.stripe_secret_key
+    # one client for the process; the SDK keeps a keep-alive session per to_thread worker
+    # (sessions are not shared across threads), so connections are reused between calls
+    stripe.default_http_client = stripe.http_client.new_default_http_client(
+        timeout=settings.stripe_http_timeout_seconds
+    )
 
 
 def _find_or_create_customer(*, email: str) -> dict[str, Any]:
-    stripe.api_key = settings.stripe_secret_key
     try:
         existing = stripe.Customer.list(email=email, limit=1)
         if existing.data:
@@ -329,24 +521,20 @@ async def subscribe(
     if not settings.stripe_secret_key:
         logger.warning("stripe.subscribe.missing_secret")
         raise HTTPException(status_code=503, detail="Stripe not configured")
-    stripe.api_key = settings.stripe_secret_key
     plan_id = payload.resolved_plan()
     plan_label = _resolve_plan_label(plan_id)
     if not payload.payment_method_id:
         logger.warning("stripe.subscribe.missing_payment_method")
         raise HTTPException(status_code=400, detail="payment_method_id is required")
+    known_customer_id = await _known_customer_id(db, payload.customer_email)
     try:
-        customer = _find_or_create_customer(email=payload.customer_email)
-        attached_pm = stripe.PaymentMethod.attach(
-            payload.payment_method_id,
-            customer=customer["id"],
+        # the Stripe SDK is synchronous; keep its HTTPS round-trips off the event loop
+        customer_id, attached_pm = await _attach_payment_method(
+            payload.customer_email, payload.payment_method_id, known_customer_id
         )
-        stripe.Customer.modify(
-            customer["id"],
-            invoice_settings={"default_payment_method": attached_pm["id"]},
-        )
-        subscription = stripe.Subscription.create(
-            customer=customer["id"],
+        subscription = await asyncio.to_thread(
+            stripe.Subscription.create,
+            customer=customer_id,
             items=[{"price": plan_id}],
             trial_period_days=TRIAL_DAYS,
             payment_behavior="default_incomplete",
@@ -359,25 +547,36 @@ async def subscribe(
     except stripe.error.StripeError as exc:  # type: ignore[attr-defined]
         logger.warning("stripe.subscribe.failed", extra={"error": str(exc)})
         raise HTTPException(status_code=400, detail="Unable to create subscription") from exc
+    try:
+        # the subscription already names its default payment method; the customer-level
+        # default is best effort and must not fail a subscription that now exists
+        await asyncio.to_thread(
+            stripe.Customer.modify,
+            customer_id,
+            invoice_settings={"default_payment_method": attached_pm["id"]},
+        )
+    except stripe.error.StripeError as exc:  # type: ignore[attr-defined]
+        logger.warning("stripe.subscribe.default_payment_method_failed", extra={"error": str(exc)})
+    default_trial_start, default_trial_end = _trial_window()
     trial_start = (
-        datetime.fromtimestamp(subscription["trial_start"], tz=timezone.utc).isoformat()
+        _from_epoch(subscription["trial_start"]).isoformat()
         if subscription.get("trial_start")
-        else _trial_window()[0]
+        else default_trial_start
     )
     trial_end = (
-        datetime.fromtimestamp(subscription["trial_end"], tz=timezone.utc).isoformat()
+        _from_epoch(subscription["trial_end"]).isoformat()
         if subscription.get("trial_end")
-        else _trial_window()[1]
+        else default_trial_end
     )
     current_period_end = (
-        datetime.fromtimestamp(subscription["current_period_end"], tz=timezone.utc).isoformat()
+        _from_epoch(subscription["current_period_end"]).isoformat()
         if subscription.get("current_period_end")
         else trial_end
     )
     client_secret = _extract_client_secret(subscription)
     record = {
         "subscription_id": subscription["id"],
-        "customer_id": customer["id"],
+        "customer_id": customer_id,
         "status": subscription.get("status", "trialing"),
         "trial_start": trial_start,
         "trial_end": trial_end,
@@ -424,22 +623,71 @@ class DeliveryTriggerResponse(BaseModel):
     output_paths: list[str]
 
 
-def _write_placeholder_artifacts() -> list[str]:
-    output_dir = Path(settings.delivery_output_dir or "output")
+# Output dir -> placeholder artifact paths already written this process.
+_placeholder_paths: dict[str, tuple[str, str]] = {}
+
+
+async def _write_placeholder_artifacts() -> tuple[str, str]:
+    """Write stub artifacts once per output dir, off the event loop."""
+    output_dir = settings.delivery_output_dir or "output"
+    paths = _placeholder_paths.get(output_dir)
+    if paths is None:
+        paths = await asyncio.to_thread(_write_placeholder_files, Path(output_dir))
+        _placeholder_paths[output_dir] = paths
+    return paths
+
+
+@lru_cache(maxsize=8)
+def _delivery_queued_json(paths: tuple[str, str]) -> bytes:
+    """Serialize the delivery acknowledgement once per artifact set; it never varies."""
+    response = DeliveryTriggerResponse(queued=True, output_paths=list(paths))
+    return response.model_dump_json().encode()
+
+
+def _write_placeholder_files(output_dir: Path) -> tuple[str, str]:
     output_dir.mkdir(parents=True, exist_ok=True)
     markdown_path = output_dir / "email_delivery_stub.md"
     slack_path = output_dir / "slack_delivery_stub.json"
     if not markdown_path.exists():
         markdown_path.write_text("# Delivery stub\n", encoding="utf-8")
     if not slack_path.exists():
-        slack_path.write_text(json.dumps({"message": "stub"}), encoding="utf-8")
-    return [str(markdown_path), str(slack_path)]
+        slack_path.write_bytes(b'{"message": "stub"}')
+    return str(markdown_path), str(slack_path)
+
+
+STRIPE_WEBHOOK_TOLERANCE_SECONDS = 300  # Stripe SDK default; rejects replayed signatures
+_SIGNATURE_FIELD = re.compile(r"(?:^|,)\s*(t|v1)=([^,]*)")
+
+
+@lru_cache(maxsize=1)
+def _webhook_secret_bytes(secret: str) -> bytes:
+    """Encode the webhook secret once; keyed on the value so settings changes apply."""
+    return secret.encode()
+
+
+def _reject_signature(event: str) -> HTTPException:
+    logger.warning(event)
+    metrics.increment("stripe.webhook.signature_invalid")
+    metrics.alert(
+        "stripe.webhook.signature_invalid",
+        value=1.0,
+        threshold=0.0,
+        severity="warning",
+    )
+    return HTTPException(status_code=403, detail="Invalid signature")
+
+
+def _signature_matches(expected: bytes, signature: str) -> bool:
+    try:
+        provided = bytes.fromhex(signature)
+    except ValueError:
+        return False
+    # compare raw 32-byte digests; a malformed or short v1 simply fails the compare
+    return len(provided) == len(expected) and hmac.compare_digest(expected, provided)
 
 
 def _verify_signature(payload: bytes, signature_header: str | None) -> None:
-    """Lightweight signature verification compatible with Stripe's v1 scheme."""
-    if not settings.stripe_webhook_secret:
-        return
+    """Verify Stripe's v1 signature and timestamp tolerance over the raw body bytes."""
     if not signature_header:
         logger.warning("stripe.webhook.signature_missing")
         metrics.increment("stripe.webhook.signature_missing")
@@ -450,45 +698,27 @@ def _verify_signature(payload: bytes, signature_header: str | None) -> None:
             severity="warning",
         )
         raise HTTPException(status_code=403, detail="Invalid signature")
-    try:
-        pairs = dict(entry.split("=", 1) for entry in signature_header.split(","))
-        timestamp = pairs.get("t")
-        signature = pairs.get("v1")
-    except Exception:  # pragma: no cover - defensive
-        logger.warning("stripe.webhook.signature_parse_failed")
-        metrics.increment("stripe.webhook.signature_invalid")
-        metrics.alert(
-            "stripe.webhook.signature_invalid",
-            value=1.0,
-            threshold=0.0,
-            severity="warning",
-        )
-        raise HTTPException(status_code=403, detail="Invalid signature")
-    if not timestamp or not signature:
-        logger.warning("stripe.webhook.signature_parts_missing")
-        metrics.increment("stripe.webhook.signature_invalid")
-        metrics.alert(
-            "stripe.webhook.signature_invalid",
-            value=1.0,
-            threshold=0.0,
-            severity="warning",
-        )
-        raise HTTPException(status_code=403, detail="Invalid signature")
-    expected = hmac.new(
-        settings.stripe_webhook_secret.encode(),
-        msg=f"{timestamp}.{payload.decode()}".encode(),
-        digestmod=sha256,
-    ).hexdigest()
-    if not hmac.compare_digest(expected, signature):
-        logger.warning("stripe.webhook.signature_mismatch")
-        metrics.increment("stripe.webhook.signature_invalid")
-        metrics.alert(
-            "stripe.webhook.signature_invalid",
-            value=1.0,
-            threshold=0.0,
-            severity="warning",
-        )
-        raise HTTPException(status_code=403, detail="Invalid signature")
+    timestamp = None
+    signatures: list[str] = []
+    # single scan over "t=...,v1=...", ignoring other schemes; several v1 entries are
+    # sent while a webhook secret is being rolled, and any one of them may match
+    for match in _SIGNATURE_FIELD.finditer(signature_header):
+        if match.group(1) == "t":
+            timestamp = match.group(2)
+        else:
+            signatures.append(match.group(2))
+    if not timestamp or not signatures:
+        raise _reject_signature("stripe.webhook.signature_parts_missing")
+    if not timestamp.isdigit() or int(timestamp) < time.time() - STRIPE_WEBHOOK_TOLERANCE_SECONDS:
+        raise _reject_signature("stripe.webhook.signature_expired")
+    # one-shot OpenSSL HMAC over "<t>.<body>"; avoids building a Python HMAC object per webhook
+    expected = hmac.digest(
+        _webhook_secret_bytes(settings.stripe_webhook_secret),
+        b"%s.%s" % (timestamp.encode(), payload),
+        "sha256",
+    )
+    if not any(_signature_matches(expected, signature) for signature in signatures):
+        raise _reject_signature("stripe.webhook.signature_mismatch")
 
 
 def _log_subscription_event(
@@ -537,8 +767,7 @@ def _undo_event_id(token_hash: str) -> str:
 
 async def _store_undo_token(db: AsyncSession, subscription_id: str, token_hash: str) -> None:
     event_id = _undo_event_id(token_hash)
-    existing = await db.execute(select(ProcessedEvent).where(ProcessedEvent.event_id == event_id))
-    if existing.scalar_one_or_none():
+    if await db.scalar(_EVENT_BY_ID, {"event_id": event_id}):
         return
     db.add(ProcessedEvent(event_id=event_id, subscription_id=subscription_id))
     try:
@@ -551,99 +780,73 @@ async def _store_undo_token(db: AsyncSession, subscription_id: str, token_hash:
 
 async def _get_undo_entry(db: AsyncSession, token_hash: str) -> ProcessedEvent | None:
     event_id = _undo_event_id(token_hash)
-    result = await db.execute(select(ProcessedEvent).where(ProcessedEvent.event_id == event_id))
-    return result.scalar_one_or_none()
+    return await db.scalar(_EVENT_BY_ID, {"event_id": event_id})
 
 
 async def _consume_undo_token(db: AsyncSession, token_hash: str) -> None:
     event_id = _undo_event_id(token_hash)
-    await db.execute(delete(ProcessedEvent).where(ProcessedEvent.event_id == event_id))
+    await db.execute(_DELETE_EVENT_BY_ID, {"event_id": event_id})
     try:
         await db.commit()
     except Exception:
         await db.rollback()
 
 
-async def _apply_subscription_event(payload: StripeWebhookPayload, db: AsyncSession | None) -> bool:
-    """Apply webhook updates; return True if duplicate already processed."""
-    if db:
-        stmt = select(ProcessedEvent).where(ProcessedEvent.event_id == payload.id)
-        result = await db.execute(stmt)
-        if result.scalar_one_or_none():
-            metrics.increment("stripe.webhook.duplicate_event", tags={"type": payload.type})
-            return True
+_SubscriptionUpdate = tuple[dict[str, Any], str | None]
 
-    if payload.type == "checkout.session.completed":
-        obj = payload.data.get("object") if payload.data else {}
-        sub_id = obj.get("subscription")
-        customer_id = obj.get("customer")
-        email = obj.get("customer_email") or obj.get("customer_details", {}).get("email")
-        if not sub_id:
-            return False
-        record = {
-            "subscription_id": sub_id,
-            "customer_id": customer_id,
-            "email": email,
-            "status": "trialing",
-            "plan_id": None,
-            "cancel_at_period_end": False,
-        }
-        await _persist_subscription_record(db, record)
-        _log_subscription_event(
-            event_id=payload.id, event_type=payload.type, record=record, note="checkout"
-        )
-        if db:
-            await _mark_event(db, payload.id, sub_id)
-        return False
 
-    if payload.type.startswith("invoice."):
-        obj = payload.data.get("object") if payload.data else {}
-        sub_id = obj.get("subscription")
-        if not sub_id:
-            return False
-        price_id: str | None = None
-        if obj.get("price"):
-            price_id = obj["price"].get("id")
-        if not price_id:
-            lines = obj.get("lines", {}).get("data", [])
-            if lines:
-                price_id = (lines[0].get("price") or {}).get("id")
-        email = obj.get("customer_email") or obj.get("customer_details", {}).get("email")
-        record = {
-            "subscription_id": sub_id,
-            "status": obj.get("status", "incomplete"),
-            "email": email,
-            "plan_id": price_id,
-            "customer_id": obj.get("customer"),
-        }
-        if payload.type == "invoice.payment_succeeded":
-            record["status"] = "active"
-        if payload.type == "invoice.payment_failed":
-            record["status"] = "past_due"
-        current_period_end = obj.get("current_period_end")
-        if current_period_end:
-            record["current_period_end"] = datetime.fromtimestamp(
-                current_period_end, tz=timezone.utc
-            ).isoformat()
-        await _persist_subscription_record(db, record)
-        _log_subscription_event(
-            event_id=payload.id, event_type=payload.type, record=record, note="invoice"
-        )
-        if db:
-            await _mark_event(db, payload.id, sub_id)
-        return False
+def _checkout_update(event_type: str, obj: dict[str, Any]) -> _SubscriptionUpdate | None:
+    sub_id = obj.get("subscription")
+    if not sub_id:
+        return None
+    email = obj.get("customer_email") or obj.get("customer_details", {}).get("email")
+    record = {
+        "subscription_id": sub_id,
+        "customer_id": obj.get("customer"),
+        "email": email,
+        "status": "trialing",
+        "plan_id": None,
+        "cancel_at_period_end": False,
+    }
+    return record, "checkout"
 
-    if not payload.type.startswith("customer.subscription"):
-        logger.info(
-            "stripe.webhook.skipped_event",
-            extra={"event_id": payload.id, "type": payload.type},
-        )
-        return False
 
-    obj = payload.data.get("object") if payload.data else {}
+# Invoice outcomes that pin the subscription status regardless of invoice.status.
+_INVOICE_STATUS_OVERRIDES = {
+    "invoice.payment_succeeded": "active",
+    "invoice.payment_failed": "past_due",
+}
+
+
+def _invoice_update(event_type: str, obj: dict[str, Any]) -> _SubscriptionUpdate | None:
+    sub_id = obj.get("subscription")
+    if not sub_id:
+        return None
+    price_id: str | None = None
+    if obj.get("price"):
+        price_id = obj["price"].get("id")
+    if not price_id:
+        lines = obj.get("lines", {}).get("data", [])
+        if lines:
+            price_id = (lines[0].get("price") or {}).get("id")
+    email = obj.get("customer_email") or obj.get("customer_details", {}).get("email")
+    record = {
+        "subscription_id": sub_id,
+        "status": _INVOICE_STATUS_OVERRIDES.get(event_type) or obj.get("status", "incomplete"),
+        "email": email,
+        "plan_id": price_id,
+        "customer_id": obj.get("customer"),
+    }
+    current_period_end = obj.get("current_period_end")
+    if current_period_end:
+        record["current_period_end"] = _from_epoch(current_period_end)
+    return record, "invoice"
+
+
+def _subscription_update(event_type: str, obj: dict[str, Any]) -> _SubscriptionUpdate | None:
     sub_id = obj.get("id")
     if not sub_id:
-        return False
+        return None
     record = {
         "subscription_id": sub_id,
         "plan_id": obj.get("plan", {}).get("id") if obj.get("plan") else None,
@@ -653,45 +856,84 @@ async def _apply_subscription_event(payload: StripeWebhookPayload, db: AsyncSess
     status = obj.get("status")
     if status:
         record["status"] = status
+    # datetimes go straight into the record; _coerce_dt passes them through unparsed
     if obj.get("trial_start"):
-        record["trial_start"] = datetime.fromtimestamp(
-            obj["trial_start"], tz=timezone.utc
-        ).isoformat()
+        record["trial_start"] = _from_epoch(obj["trial_start"])
     if obj.get("trial_end"):
-        record["trial_end"] = datetime.fromtimestamp(obj["trial_end"], tz=timezone.utc).isoformat()
+        record["trial_end"] = _from_epoch(obj["trial_end"])
     if obj.get("current_period_end"):
-        record["current_period_end"] = datetime.fromtimestamp(
-            obj["current_period_end"], tz=timezone.utc
-        ).isoformat()
-    record["cancel_at_period_end"] = obj.get(
-        "cancel_at_period_end", record.get("cancel_at_period_end", False)
-    )
+        record["current_period_end"] = _from_epoch(obj["current_period_end"])
+    record["cancel_at_period_end"] = obj.get("cancel_at_period_end", False)
     if obj.get("default_payment_method"):
         record["payment_method_id"] = obj["default_payment_method"]
-    if obj.get("customer"):
-        record["customer_id"] = obj["customer"]
-    if payload.type == "customer.subscription.trial_will_end":
+    if event_type == "customer.subscription.trial_will_end":
         logger.info(
             "stripe.subscription.trial_will_end",
             extra={"subscription_id": sub_id, "email_domain": _mask_email(record.get("email"))},
         )
-    await _persist_subscription_record(db, record)
-    _log_subscription_event(event_id=payload.id, event_type=payload.type, record=record)
+    return record, None
+
+
+_SubscriptionHandler = Callable[[str, dict[str, Any]], _SubscriptionUpdate | None]
+
+# Exact event types first, then the event family (type minus its last segment).
+_EVENT_HANDLERS: dict[str, _SubscriptionHandler] = {
+    "checkout.session.completed": _checkout_update,
+}
+_EVENT_FAMILY_HANDLERS: dict[str, _SubscriptionHandler] = {
+    "invoice": _invoice_update,
+    "customer.subscription": _subscription_update,
+}
+
+
+def _resolve_event_handler(event_type: str) -> _SubscriptionHandler | None:
+    handler = _EVENT_HANDLERS.get(event_type)
+    if handler is None:
+        handler = _EVENT_FAMILY_HANDLERS.get(event_type.rpartition(".")[0])
+    return handler
+
+
+async def _apply_subscription_event(payload: StripeWebhookPayload, db: AsyncSession | None) -> bool:
+    """Apply webhook updates; return True if duplicate already processed."""
+    if payload.id in _recent_events:
+        metrics.increment("stripe.webhook.duplicate_event", tags={"type": payload.type})
+        return True
     if db:
-        await _mark_event(db, payload.id, sub_id)
+        if await db.scalar(_EVENT_BY_ID, {"event_id": payload.id}):
+            _remember_event(payload.id)
+            metrics.increment("stripe.webhook.duplicate_event", tags={"type": payload.type})
+            return True
+
+    handler = _resolve_event_handler(payload.type)
+    if handler is None:
+        logger.info(
+            "stripe.webhook.skipped_event",
+            extra={"event_id": payload.id, "type": payload.type},
+        )
+        return False
+    obj = payload.data.get("object") if payload.data else {}
+    update = handler(payload.type, obj)
+    if update is None:
+        return False
+    record, note = update
+    subscription = await _persist_subscription_record(db, record, commit=False)
+    _log_subscription_event(event_id=payload.id, event_type=payload.type, record=record, note=note)
+    if db and await _mark_event(db, payload.id, record["subscription_id"], subscription):
+        metrics.increment("stripe.webhook.duplicate_event", tags={"type": payload.type})
+        return True
     return False
 
 
 async def _resolve_subscription(payload: CancelRequest, db: AsyncSession | None) -> dict[str, Any]:
     if db is None:
         raise HTTPException(status_code=503, detail="Database not configured")
-    stmt = select(Subscription)
     if payload.subscription_id:
-        stmt = stmt.where(Subscription.subscription_id == payload.subscription_id)
-    elif payload.email:
-        stmt = stmt.where(Subscription.email == payload.email)
-    result = await db.execute(stmt)
-    found = result.scalar_one_or_none()
+        # primary-key lookup: served from the session identity map when already loaded
+        found = await db.get(Subscription, payload.subscription_id)
+    else:
+        # an email can own several rows (resubscribes, case-collapsed legacy rows);
+        # act on the most recently updated one rather than an arbitrary first row
+        found = await db.scalar(_LATEST_SUBSCRIPTION_BY_EMAIL, {"email": payload.email})
     if found:
         return {
             "subscription_id": found.subscription_id,
@@ -700,10 +942,8 @@ async def _resolve_subscription(payload: CancelRequest, db: AsyncSession | None)
             "plan_id": found.price_id,
             "status": found.status,
             "cancel_at_period_end": found.cancel_at_period_end,
-            "current_period_end": found.current_period_end.isoformat()
-            if found.current_period_end
-            else None,
-            "trial_end": found.trial_end.isoformat() if found.trial_end else None,
+            "current_period_end": found.current_period_end,
+            "trial_end": found.trial_end,
             "payment_method_id": found.default_payment_method,
         }
     logger.warning("stripe.cancel.no_target")
@@ -711,11 +951,13 @@ async def _resolve_subscription(payload: CancelRequest, db: AsyncSession | None)
 
 
 @router.post("/delivery/weekly", response_model=DeliveryTriggerResponse, status_code=202)
-async def trigger_delivery(_: DeliveryTriggerRequest) -> DeliveryTriggerResponse:
+async def trigger_delivery(_: DeliveryTriggerRequest) -> Response:
     """Queue weekly delivery; writes placeholder artifacts for offline/local runs."""
-    paths = _write_placeholder_artifacts()
-    logger.info("delivery.weekly.queued", extra={"artifacts": paths})
-    return DeliveryTriggerResponse(queued=True, output_paths=paths)
+    paths = await _write_placeholder_artifacts()
+    logger.info("delivery.weekly.queued", extra={"artifacts": list(paths)})
+    return Response(
+        content=_delivery_queued_json(paths), status_code=202, media_type="application/json"
+    )
 
 
 class ReminderRequest(BaseModel):
@@ -724,11 +966,13 @@ class ReminderRequest(BaseModel):
 
 
 @router.post("/delivery/reminder", response_model=DeliveryTriggerResponse, status_code=202)
-async def send_reminder(payload: ReminderRequest) -> DeliveryTriggerResponse:
+async def send_reminder(payload: ReminderRequest) -> Response:
     """Queue a reminder notification."""
-    paths = _write_placeholder_artifacts()
+    paths = await _write_placeholder_artifacts()
     logger.info("delivery.reminder", extra={"email": payload.email, "channel": payload.channel})
-    return DeliveryTriggerResponse(queued=True, output_paths=paths)
+    return Response(
+        content=_delivery_queued_json(paths), status_code=202, media_type="application/json"
+    )
 
 
 class StripeWebhookPayload(BaseModel):
@@ -762,12 +1006,11 @@ async def stripe_webhook(
     await _ensure_event_tables(db)
     try:
         if settings.stripe_webhook_secret:
-            event_obj = stripe.Webhook.construct_event(
-                payload=body, sig_header=stripe_signature, secret=settings.stripe_webhook_secret
-            )
-        else:
             _verify_signature(body, stripe_signature)
-            event_obj = json.loads(body.decode())
+        event_obj = json.loads(body)
+    except HTTPException:
+        # signature failures keep their 403
+        raise
     except Exception:
         logger.warning("stripe.webhook.invalid_payload")
         metrics.increment(
@@ -781,7 +1024,18 @@ async def stripe_webhook(
             tags={"has_signature": bool(stripe_signature)},
         )
         raise HTTPException(status_code=400, detail="Invalid payload")
-    payload = StripeWebhookPayload.model_validate(event_obj)
+    if isinstance(event_obj, dict):
+        # only id/type/data are used; hand pydantic just those instead of the whole event
+        event_obj = {
+            "id": event_obj.get("id"),
+            "type": event_obj.get("type"),
+            "data": event_obj.get("data") or {},
+        }
+    try:
+        payload = StripeWebhookPayload.model_validate(event_obj)
+    except ValidationError as exc:
+        # well-formed JSON that is not an event: a schema mismatch, not a bad delivery
+        raise RequestValidationError(exc.errors(include_url=False)) from exc
     duplicate = await _apply_subscription_event(payload, db)
     if duplicate:
         logger.info("stripe.webhook.duplicate", extra={"event_id": payload.id})
@@ -808,9 +1062,9 @@ async def cancel_subscription(
         raise HTTPException(status_code=400, detail="subscription_id or email is required")
     subscription = await _resolve_subscription(payload, db)
     if settings.stripe_secret_key:
-        stripe.api_key = settings.stripe_secret_key
         try:
-            stripe.Subscription.modify(
+            await asyncio.to_thread(
+                stripe.Subscription.modify,
                 subscription["subscription_id"],
                 cancel_at_period_end=True,
             )
@@ -900,9 +1154,7 @@ async def cancel_undo(
             },
         )
         raise HTTPException(status_code=410, detail="Undo token expired")
-    stmt = select(Subscription).where(Subscription.subscription_id == entry.subscription_id)
-    result = await db.execute(stmt)
-    subscription = result.scalar_one_or_none()
+    subscription = await db.scalar(_SUBSCRIPTION_BY_ID, {"subscription_id": entry.subscription_id})
     if not subscription:
         await _consume_undo_token(db, token_hash)
         raise HTTPException(status_code=404, detail="Subscription not found")
@@ -916,9 +1168,12 @@ async def cancel_undo(
         "payment_method_id": subscription.default_payment_method,
     }
     if settings.stripe_secret_key:
-        stripe.api_key = settings.stripe_secret_key
         try:
-            stripe.Subscription.modify(subscription.subscription_id, cancel_at_period_end=False)
+            await asyncio.to_thread(
+                stripe.Subscription.modify,
+                subscription.subscription_id,
+                cancel_at_period_end=False,
+            )
         except stripe.error.StripeError as exc:  # type: ignore[attr-defined]
             logger.warning(
                 "stripe.cancel.undo_failed",
@@ -972,14 +1227,7 @@ async def get_subscription_state(
     if db is None:
         logger.warning("stripe.subscription_state.db_missing")
         raise HTTPException(status_code=503, detail="Database not configured")
-    stmt = (
-        select(Subscription)
-        .where(Subscription.email == session.email)
-        .order_by(Subscription.updated_at.desc())
-        .limit(1)
-    )
-    result = await db.execute(stmt)
-    record = result.scalar_one_or_none()
+    record = await db.scalar(_LATEST_SUBSCRIPTION_BY_EMAIL, {"email": session.email})
     if not record:
         logger.info(
             "stripe.subscription_state.missing",
@@ -116,7 +116,11 @@ class Settings(BaseSettings):
     # Auth controls
     auth_rate_limit_window_seconds: int = 60
     auth_rate_limit_max_requests: int = 5
+    auth_max_inflight_records: int = 100_000
+    unlock_dedup_capacity: int = 200_000
     cancel_undo_ttl_seconds: int = 172800
+    stripe_event_dedup_capacity: int = 4096
+    stripe_http_timeout_seconds: int = 30
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
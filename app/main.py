@@ -60,12 +60,17 @@ async def lifespan(app: FastAPI):
     # Initialize database
     await init_database()
 
+    delivery_routes.configure_stripe()
+    delivery_routes.warm_leads_cache()
+
     logger.info("Application startup complete")
 
     yield
 
     # Shutdown
     logger.info("Shutting down application")
+    auth_routes._smtp_pool.close()
+    await auth_routes.close_google_client()
 
 
 # Create FastAPI application
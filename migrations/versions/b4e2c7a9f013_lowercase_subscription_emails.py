@@ -0,0 +1,20 @@
+"""Lowercase stored subscription emails to match normalized auth emails."""
+
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b4e2c7a9f013"
+down_revision = "7d1c8f9d3a4b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("UPDATE subscriptions SET email = lower(email) WHERE email <> lower(email)")
+
+
+def downgrade() -> None:
+    # original casing is not recoverable; lowercase emails remain valid
+    pass